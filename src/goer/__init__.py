@@ -1,6 +1,6 @@
-__all__ = ("shell", "glob")
+__all__ = ("shell", "glob", "Step")
 
 """Export dependency definition functions."""
 
 from .files import glob
-from .shell import shell
+from .shell import Step, shell
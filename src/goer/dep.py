@@ -6,15 +6,16 @@ creates in a `Goerfile.py`, and the internal `Dependency` instances, which are
 used to actually execute the dependencies.
 """
 
-import random
+import asyncio
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Sequence
 
-from goer.text import COLORS, TextMode, print_error
+from goer.text import TextMode, next_color, print_error
 
 
-@dataclass
+@dataclass(slots=True)
 class Dependency(ABC):
     """An abstract dependency.
 
@@ -23,13 +24,19 @@ class Dependency(ABC):
     """
 
     dep_id: str
-    color: str = field(default_factory=lambda: random.choice(COLORS))
-    depends_on: list["Dependency"] = field(default_factory=list)
-
-    @property
-    def pretty_id(self) -> str:
-        """A colorized pretty ID, for printing in the terminal."""
-        return f"{self.color}{self.dep_id}{TextMode.RESET}"
+    color: str = field(default_factory=next_color)
+    depends_on: Sequence["Dependency"] = ()
+    pretty_id: str = field(init=False, repr=False, compare=False)
+    """A colorized pretty ID, for printing in the terminal."""
+    task: asyncio.Future[bool] | None = field(init=False, repr=False, compare=False)
+    """The task running the dependency, once the dependency manager has
+    started it."""
+
+    def __post_init__(self) -> None:
+        self.pretty_id = f"{self.color}{self.dep_id}{TextMode.RESET}"
+        # Set here, as slots leave no class level default for subclasses
+        # without slots, whose generated `__init__` would otherwise skip it.
+        self.task = None
 
     @property
     def last_modified(self) -> datetime:
@@ -37,6 +44,17 @@ class Dependency(ABC):
         value is lower than that of their sub-dependencies."""
         return datetime.now()
 
+    @property
+    def last_modified_ts(self) -> float:
+        """The `last_modified` value as a Unix timestamp, which is what the
+        dependency manager compares. Implementations should override this
+        directly, when they can avoid constructing a `datetime`."""
+        return self.last_modified.timestamp()
+
+    def invalidate(self) -> None:
+        """Forgets any state cached by the dependency, e.g. modification times,
+        so it is read again. Called before every run."""
+
     async def run(self) -> bool:
         """Runs the dependency (e.g. `_run`), handling exceptions by printing an
         error message and returning `False`."""
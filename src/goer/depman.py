@@ -9,113 +9,194 @@ including running all sub-dependencies.
 """
 
 import asyncio
-import random
-from typing import Iterable
+import os
+from collections import deque
+from typing import Iterable, Sequence
 
 from goer.dep import Dependency, DependencyDef
-from goer.text import COLORS, print_error, print_header
+from goer.text import next_color, print_error, print_header
 
 
 class DependencyManager:
-    """Runs a dependency tree recursively."""
+    """Runs dependency trees from a single scheduling loop with
+    `run_subgraph`.
 
-    def __init__(self, deps: Iterable[Dependency]) -> None:
+    At most `max_concurrency` dependencies run at the same time, by default one
+    per CPU.
+    """
+
+    def __init__(
+        self, deps: Iterable[Dependency], max_concurrency: int | None = None
+    ) -> None:
         self.deps: dict[str, Dependency] = {dep.dep_id: dep for dep in deps}
-        self.deps_running: dict[str, asyncio.Future[bool]] = {}
-
-    async def run_dep(self, dep: Dependency) -> bool:
-        """Runs the dependency tree."""
-
-        last_modified = dep.last_modified
-        if dep.depends_on and all(
-            last_modified > dep_dep.last_modified for dep_dep in dep.depends_on
-        ):
-            print_header("skipping '", dep.pretty_id, "'")
-            return True
-
-        print_header("starting '", dep.pretty_id, "'")
-        try:
-            return await self._run_dep(dep)
-        except Exception as e:
-            print_error(f"dependency '{dep.dep_id}' failed with error: {e}")
-            return False
-
-    async def _run_dep(self, dep: Dependency) -> bool:
-        if check_job_result := await self._run_recursive_deps(dep) is not None:
-            return check_job_result
-
-        if running_dep := self.deps_running.get(dep.dep_id):
-            return await running_dep
-
-        dep_task = asyncio.create_task(dep.run())
-        self.deps_running[dep.dep_id] = dep_task
-        return await dep_task
-
-    async def _run_recursive_deps(self, dep: Dependency) -> bool | None:
-        if dep.depends_on:
-            print_header("running dependencies for '", dep.pretty_id, "'")
-            tasks: list[asyncio.Future[bool]] = []
-            for dep in dep.depends_on:
-                if dep_fut := self.deps_running.get(dep.dep_id):
-                    tasks.append(dep_fut)
+        self._dependents: dict[str, list[Dependency]] = {}
+        for dep in self.deps.values():
+            for dep_dep in dep.depends_on:
+                self._dependents.setdefault(dep_dep.dep_id, []).append(dep)
+        self._last_modified_cache: dict[str, float] = {}
+        self._run_slots = asyncio.Semaphore(max_concurrency or os.cpu_count() or 1)
+
+    def clear_last_modified_cache(self) -> None:
+        """Forgets the cached `last_modified_ts` values, so they are read again
+        on the next run."""
+        self._last_modified_cache.clear()
+
+    def _last_modified_ts(self, dep: Dependency) -> float:
+        last_modified_ts = self._last_modified_cache.get(dep.dep_id)
+        if last_modified_ts is None:
+            last_modified_ts = dep.last_modified_ts
+            self._last_modified_cache[dep.dep_id] = last_modified_ts
+        return last_modified_ts
+
+    def _can_skip(self, dep: Dependency) -> bool:
+        last_modified_ts = self._last_modified_ts(dep)
+        return bool(dep.depends_on) and all(
+            last_modified_ts > self._last_modified_ts(dep_dep)
+            for dep_dep in dep.depends_on
+        )
+
+    async def run_subgraph(
+        self, targets: Sequence[Dependency], force: bool = False
+    ) -> bool:
+        """Runs the dependency trees rooted at the given targets.
+
+        The dependencies which need to run are found up front. Dependencies
+        which are newer than their sub-dependencies are skipped, along with
+        their sub-dependencies, unless `force` is given. They are then
+        scheduled from a single loop, which starts every dependency as soon as
+        all of its sub-dependencies have finished. The dependents of every
+        dependency are resolved once, when the manager is created. Returns
+        `True` if all targets succeed.
+        """
+        needed: dict[str, Dependency] = {}
+        stack = list(targets)
+        while stack:
+            dep = stack.pop()
+            if dep.dep_id in needed:
+                continue
+            if not force and self._can_skip(dep):
+                print_header("skipping '", dep.pretty_id, "'")
+                continue
+            needed[dep.dep_id] = dep
+            stack.extend(dep.depends_on)
+
+        in_degree = {
+            dep_id: sum(dep_dep.dep_id in needed for dep_dep in dep.depends_on)
+            for dep_id, dep in needed.items()
+        }
+
+        results: dict[str, bool] = {}
+        ready = [dep for dep_id, dep in needed.items() if in_degree[dep_id] == 0]
+        pending: dict[asyncio.Future[bool], Dependency] = {}
+        create_task = asyncio.get_running_loop().create_task
+
+        def finish(dep: Dependency, result: bool) -> None:
+            results[dep.dep_id] = result
+            for dependent in self._dependents.get(dep.dep_id, ()):
+                if dependent.dep_id not in in_degree:
+                    continue
+                in_degree[dependent.dep_id] -= 1
+                if in_degree[dependent.dep_id] == 0:
+                    ready.append(dependent)
+
+        while ready or pending:
+            while ready:
+                dep = ready.pop()
+                if not all(
+                    results.get(dep_dep.dep_id, True) for dep_dep in dep.depends_on
+                ):
+                    print_error("dependency failed for '", dep.pretty_id, "'")
+                    finish(dep, False)
+                elif running_dep := dep.task:
+                    pending[running_dep] = dep
                 else:
-                    tasks.append(
-                        asyncio.create_task(self.run_dep(dep), name=dep.dep_id)
-                    )
-
-            results = await asyncio.gather(*tasks)
-            if not all(results):
-                print_error("dependency failed for '", dep.pretty_id, "'")
-                return False
-
-        return None
+                    dep_task = create_task(self._run_bounded(dep), name=dep.dep_id)
+                    dep.task = dep_task
+                    pending[dep_task] = dep
+
+            if not pending:
+                break
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for dep_fut in done:
+                dep = pending.pop(dep_fut)
+                # Running a dependency may modify its targets.
+                self._last_modified_cache.pop(dep.dep_id, None)
+                finish(dep, dep_fut.result())
+
+        if len(results) < len(needed):
+            remaining = [dep_id for dep_id in needed if dep_id not in results]
+            raise RuntimeError(f"Dependency cycle among {remaining}")
+
+        return all(results.get(dep.dep_id, True) for dep in targets)
+
+    async def run_dep(self, dep: Dependency, force: bool = False) -> bool:
+        """Runs the dependency tree rooted at the dependency, like
+        `run_subgraph`."""
+        return await self.run_subgraph([dep], force)
+
+    async def _run_bounded(self, dep: Dependency) -> bool:
+        """Runs the dependency, once fewer than `max_concurrency` dependencies
+        are running. The dependency is reported as starting at that point."""
+        async with self._run_slots:
+            print_header("starting '", dep.pretty_id, "'")
+            return await dep.run()
 
     @staticmethod
-    def from_defs(defs: dict[str, DependencyDef]) -> "DependencyManager":
+    def from_defs(
+        defs: dict[str, DependencyDef], max_concurrency: int | None = None
+    ) -> "DependencyManager":
         """Initialize a dependency manager from dependency definitions.
 
         Sets up correct relations between definitions. Dependency cycles will
         result in an error being raised.
         """
-        uninitialized_dep_defs = dict(defs)
+        dep_ids_by_def = {id(dep_def): dep_id for dep_id, dep_def in defs.items()}
+        dep_dep_ids = {
+            dep_id: _find_dep_ids(dep_ids_by_def, dep_id, dep_def.depends_on)
+            for dep_id, dep_def in defs.items()
+        }
+
+        dependents: dict[str, list[str]] = {dep_id: [] for dep_id in defs}
+        in_degree: dict[str, int] = {}
+        for dep_id, dep_ids in dep_dep_ids.items():
+            in_degree[dep_id] = len(dep_ids)
+            for dep_dep_id in dep_ids:
+                dependents[dep_dep_id].append(dep_id)
+
+        ready = deque(dep_id for dep_id, degree in in_degree.items() if degree == 0)
         initialized_deps: dict[str, Dependency] = {}
-
-        iterations_left = 1000
-        while uninitialized_dep_defs:
-            iterations_left -= 1
-            if iterations_left <= 0:
-                raise RuntimeError("Could not resolve dependencies")
-
-            for dep_id, dep_def in dict(uninitialized_dep_defs).items():
-                dep_ids = _find_dep_ids(defs, dep_def.depends_on)
-                if not all(dep_dep_id in initialized_deps for dep_dep_id in dep_ids):
-                    continue
-
-                initialized_deps[dep_id] = dep_def.initialize(
-                    dep_id,
-                    random.choice(COLORS),
-                    depends_on=[initialized_deps[dep_dep_id] for dep_dep_id in dep_ids],
-                )
-                del uninitialized_dep_defs[dep_id]
-
-        return DependencyManager(initialized_deps.values())
+        while ready:
+            dep_id = ready.popleft()
+            initialized_deps[dep_id] = defs[dep_id].initialize(
+                dep_id,
+                next_color(),
+                depends_on=[
+                    initialized_deps[dep_dep_id] for dep_dep_id in dep_dep_ids[dep_id]
+                ],
+            )
+            for dependent_id in dependents[dep_id]:
+                in_degree[dependent_id] -= 1
+                if in_degree[dependent_id] == 0:
+                    ready.append(dependent_id)
+
+        if len(initialized_deps) < len(defs):
+            remaining = [dep_id for dep_id in defs if dep_id not in initialized_deps]
+            raise RuntimeError(f"Dependency cycle among {remaining}")
+
+        return DependencyManager(initialized_deps.values(), max_concurrency)
 
     def find_deps(self, dep_ids: list[str]) -> list[Dependency]:
-        return [dep for dep in self.deps.values() if dep.dep_id in dep_ids]
+        return [self.deps[dep_id] for dep_id in dep_ids if dep_id in self.deps]
 
 
 def _find_dep_ids(
-    defs: dict[str, DependencyDef], deps: list[DependencyDef]
+    dep_ids_by_def: dict[int, str], dep_id: str, deps: list[DependencyDef]
 ) -> list[str]:
-    dep_ids: list[str] = []
-
-    for dep in deps:
-        found = False
-        for dep_id, dep_def in defs.items():
-            if dep is dep_def:
-                dep_ids.append(dep_id)
-                found = True
-        if not found:
-            raise RuntimeError(f"Could not match dependency")
-
-    return dep_ids
+    try:
+        return [dep_ids_by_def[id(dep)] for dep in deps]
+    except KeyError:
+        raise RuntimeError(
+            f"Could not match dependency of '{dep_id}', it must be assigned to "
+            "a variable in the same file"
+        ) from None
@@ -3,9 +3,12 @@
 Contains functionality for defining dependencies on files.
 """
 
+import fnmatch
+import functools
 import glob as builtin_glob
 import os
 from datetime import datetime
+from typing import Iterator
 
 from goer.dep import Dependency, DependencyDef
 
@@ -23,10 +26,43 @@ class Glob(Dependency):
     def last_modified(self) -> datetime:
         """A glob is last modified at the latest time any file matched by glob
         is modified."""
-        return max(
-            datetime.fromtimestamp(os.stat(path).st_mtime)
-            for path in builtin_glob.glob(self._pattern)
-        )
+        return datetime.fromtimestamp(self.last_modified_ts)
+
+    @functools.cached_property
+    def last_modified_ts(self) -> float:
+        """The latest modification time of any matched file, as a Unix
+        timestamp. Cached until `invalidate` is called."""
+        return max(self._mtimes())
+
+    def invalidate(self) -> None:
+        """Forgets the cached modification time of the matched files."""
+        vars(self).pop("last_modified_ts", None)
+
+    def _mtimes(self) -> Iterator[float]:
+        """Yields the modification time of each file matched by the glob.
+
+        Patterns with wildcards only in the file name, optionally below a
+        recursive `**` directory, are matched against `os.scandir` listings,
+        which reuse the stat information of the directory entries. Other
+        patterns fall back to `glob.iglob`.
+        """
+        parent, name = os.path.split(self._pattern)
+        root, recursive = parent, False
+        if os.path.basename(parent) == "**":
+            root, recursive = os.path.dirname(parent), True
+        if builtin_glob.has_magic(root) or "**" in name:
+            for path in builtin_glob.iglob(self._pattern, recursive=True):
+                yield os.stat(path).st_mtime
+            return
+
+        if not recursive and not builtin_glob.has_magic(name):
+            try:
+                yield os.stat(self._pattern).st_mtime
+            except FileNotFoundError:
+                pass
+            return
+
+        yield from _scan_mtimes(root or os.curdir, name, recursive)
 
     async def _run(self) -> bool:
         """The glob always runs successfully."""
@@ -34,6 +70,49 @@ class Glob(Dependency):
         return True
 
 
+def _scan_mtimes(
+    directory: str,
+    name: str,
+    recursive: bool,
+    visited: set[tuple[int, int]] | None = None,
+) -> Iterator[float]:
+    """Yields the modification time of each entry in the directory, matching
+    the name pattern.
+
+    Recursive scans also match entries in every non-hidden subdirectory, like
+    `**` does in `glob`, following symlinks. Every directory is only scanned
+    once, tracked by device and inode in `visited`, so symlink loops end.
+    """
+    try:
+        entries = os.scandir(directory)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+
+    if recursive and visited is None:
+        directory_stat = os.stat(directory)
+        visited = {(directory_stat.st_dev, directory_stat.st_ino)}
+
+    match_hidden = name.startswith(".")
+    subdirs: list[os.DirEntry[str]] = []
+    with entries:
+        for entry in entries:
+            hidden = entry.name.startswith(".")
+            if recursive and not hidden and entry.is_dir():
+                subdirs.append(entry)
+            if hidden and not match_hidden:
+                continue
+            if fnmatch.fnmatchcase(entry.name, name):
+                yield entry.stat().st_mtime
+
+    for subdir in subdirs:
+        subdir_stat = subdir.stat()
+        key = (subdir_stat.st_dev, subdir_stat.st_ino)
+        if visited is None or key in visited:
+            continue
+        visited.add(key)
+        yield from _scan_mtimes(subdir.path, name, recursive, visited)
+
+
 class GlobDef(DependencyDef):
     """A definition of a dependency on files identified by a glob."""
 
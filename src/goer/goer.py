@@ -1,7 +1,8 @@
 """The main module, which contains the `Gør` class, which uses the
 `DependencyManager` to run dependencies."""
 
-import asyncio
+import importlib.util
+import sys
 import time
 from typing import Any
 
@@ -26,15 +27,21 @@ class Gør:
         """Returns all dependency definitions."""
         return [dep_id for dep_id in self.depman.deps.keys()]
 
-    async def run(self, dep_ids: list[str]) -> bool:
-        """Runs the dependencies identified by the given IDs.
+    async def run(self, dep_ids: list[str], force: bool = False) -> bool:
+        """Runs the dependencies identified by the given IDs. With `force`,
+        dependencies are run even if they are up to date.
 
         Returns `True` if all dependencies are successful, `False` otherwise."""
         t = time.time()
+        # Output is written to the buffer of stdout, so text printed while
+        # loading the dependencies is written first.
+        sys.stdout.flush()
+        self.depman.clear_last_modified_cache()
+        for dep in self.depman.deps.values():
+            dep.invalidate()
 
         deps = self.depman.find_deps(dep_ids)
-        results = await asyncio.gather(*[self.depman.run_dep(dep) for dep in deps])
-        failed_deps = not all(results)
+        failed_deps = not await self.depman.run_subgraph(deps, force)
         if failed_deps:
             print_error("deps failed")
 
@@ -43,16 +50,26 @@ class Gør:
         return failed_deps
 
     @staticmethod
-    def load_python(path: str) -> "Gør":
-        """Load a python file with dependency definitions."""
-        scope: dict[str, Any] = {}
+    def load_python(path: str, max_concurrency: int | None = None) -> "Gør":
+        """Load a python file with dependency definitions.
 
-        with open(path) as f:
-            exec(f.read(), {}, scope)
+        At most `max_concurrency` dependencies are run at once, by default one
+        per CPU.
+
+        The file is loaded as a module, so its compiled bytecode is cached in
+        `__pycache__` and reused by later invocations.
+        """
+        spec = importlib.util.spec_from_file_location("goerfile", path)
+        if spec is None or spec.loader is None:
+            raise RuntimeError(f"Cannot load python file '{path}'")
+
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        scope: dict[str, Any] = vars(module)
 
         dep_defs = {
             dep_id: dep_def
             for dep_id, dep_def in scope.items()
             if isinstance(dep_def, DependencyDef)
         }
-        return Gør(DependencyManager.from_defs(dep_defs))
+        return Gør(DependencyManager.from_defs(dep_defs, max_concurrency))
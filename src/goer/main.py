@@ -1,20 +1,64 @@
 import asyncio
 import sys
+from dataclasses import dataclass, field
 
 from goer.goer import Gør
 
 
 def usage() -> None:
     """Prints the usage of the `goer` CLI."""
-    print("goer [-h|--help] [DEPENDENCY]...")
+    print("goer [-h|--help] [-f|--force] [-j|--jobs N] [DEPENDENCY]...")
     print("Execute dependencies defined in python files.")
     print()
     print("Options:")
     print("  -h, --help   print this message")
+    print("  -f, --force  run dependencies, even if they are up to date")
+    print("  -j, --jobs N run at most N dependencies at once (default: CPU count)")
     print()
     print("Copyright 2024, Numerous ApS")
 
 
+@dataclass
+class Args:
+    """The parsed arguments of the `goer` command."""
+
+    dep_ids: list[str] = field(default_factory=list)
+    force: bool = False
+    max_concurrency: int | None = None
+
+
+def parse_args(args: list[str]) -> Args:
+    """Parses the arguments of the `goer` command, except for `--help`.
+
+    Raises `ValueError` for unknown options and invalid values.
+    """
+    parsed = Args()
+    arg_iter = iter(args)
+    for arg in arg_iter:
+        if arg in ("-f", "--force"):
+            parsed.force = True
+        elif arg in ("-j", "--jobs"):
+            jobs = next(arg_iter, None)
+            if jobs is None:
+                raise ValueError(f"{arg} requires a number")
+            parsed.max_concurrency = _parse_jobs(arg, jobs)
+        elif arg.startswith("--jobs="):
+            parsed.max_concurrency = _parse_jobs("--jobs", arg.removeprefix("--jobs="))
+        elif arg.startswith("-j"):
+            parsed.max_concurrency = _parse_jobs("-j", arg.removeprefix("-j"))
+        elif arg.startswith("-"):
+            raise ValueError(f"unknown option {arg}")
+        else:
+            parsed.dep_ids.append(arg)
+    return parsed
+
+
+def _parse_jobs(option: str, jobs: str) -> int:
+    if not jobs.isdigit() or int(jobs) < 1:
+        raise ValueError(f"{option} must be a positive number")
+    return int(jobs)
+
+
 def main() -> None:
     """Run the `goer` command."""
     args = sys.argv[1:]
@@ -23,18 +67,24 @@ def main() -> None:
         sys.exit(0)
 
     try:
-        gør = Gør.load_python("Goerfile.py")
+        parsed = parse_args(args)
+    except ValueError as e:
+        print(f"error: {e}")
+        usage()
+        sys.exit(1)
+
+    try:
+        gør = Gør.load_python("Goerfile.py", parsed.max_concurrency)
     except FileNotFoundError:
         print("error: no Goerfile.py found")
         usage()
         sys.exit(1)
 
-    job_ids = args
-    if not job_ids:
+    if not parsed.dep_ids:
         print("available dependencies:", *gør.list_dep_ids())
         sys.exit(0)
 
-    if asyncio.run(gør.run(job_ids)):
+    if asyncio.run(gør.run(parsed.dep_ids, parsed.force)):
         sys.exit(0)
     else:
         sys.exit(1)
@@ -5,53 +5,161 @@ Contains functionality for defining dependencies on shell scripts.
 
 import asyncio
 import os
-import random
-from asyncio import StreamReader, subprocess
+import re
+import shlex
+import sys
+from asyncio import subprocess
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Sequence
+from typing import BinaryIO, Iterator, Sequence
 
 from goer.dep import Dependency, DependencyDef
-from goer.text import COLORS, TextMode
+from goer.text import TextMode, interactive_stdout, next_color, write_stdout
+
+_READ_CHUNK_SIZE = 64 * 1024
+"""The size of a full pipe buffer. Reads of at least this many bytes from the
+output of steps are assumed to have more data behind them."""
+
+_MAX_LINE_SIZE = 1024 * 1024
+"""The number of bytes of step output, which are buffered at most while
+waiting for the end of a line."""
+
+
+_SHELL_SYNTAX = re.compile(r"[|&;<>$`*?\[\]{}()~#!\\\n]")
+"""Characters which may need a shell to interpret the command."""
+
+_SHELL_BUILTINS = frozenset(
+    {
+        *(".", "alias", "builtin", "case", "cd", "command", "coproc"),
+        *("declare", "eval", "exec", "exit", "export", "for", "function"),
+        *("hash", "if", "let", "local", "popd", "pushd", "read", "readonly"),
+        *("return", "select", "set", "shift", "shopt", "source", "time"),
+        *("trap", "type", "ulimit", "umask", "unalias", "unset", "until"),
+        *("wait", "while"),
+    }
+)
+"""Bash builtins and keywords, which cannot be executed as programs."""
 
 
 class Step:
-    """A step is a single bash command."""
+    """A step is a single bash command.
 
-    def __init__(self, cmd: str) -> None:
+    Consecutive steps marked as `parallel` run concurrently, and are not
+    ordered with respect to each other.
+    """
+
+    __slots__ = ("cmd", "parallel", "_argv")
+
+    def __init__(self, cmd: str, parallel: bool = False) -> None:
         self.cmd = cmd
+        self.parallel = parallel
+        self._argv = _simple_argv(cmd)
 
     async def run(
-        self, env: dict[str, str], workdir: str | None = None
-    ) -> tuple[subprocess.Process, StreamReader, StreamReader]:
-        """Runs the step command in a bash process, with the given environment,
-        and in the given working directory -- or the current directory, if none
-        is given.
+        self,
+        env: dict[str, str] | dict[bytes, bytes] | None = None,
+        workdir: str | None = None,
+        *,
+        stdout: int | None,
+        stderr: int | None,
+    ) -> subprocess.Process:
+        """Runs the step command in a bash process, with the given environment
+        -- or the environment of this process, if none is given -- and in the
+        given working directory -- or the current directory, if none is given.
+
+        The output of the process is written to the given `stdout` and `stderr`
+        file descriptors, or to those of this process, if they are `None`.
+
+        Commands without any shell syntax are executed directly, without
+        starting bash first.
         """
-        proc = await subprocess.create_subprocess_exec(
+        if self._argv is not None:
+            try:
+                return await subprocess.create_subprocess_exec(
+                    *self._argv, env=env, cwd=workdir, stdout=stdout, stderr=stderr
+                )
+            except (FileNotFoundError, PermissionError):
+                # Let bash report the failure, like for any other command.
+                pass
+
+        return await subprocess.create_subprocess_exec(
             "bash",
             "-c",
             self.cmd,
             env=env,
             cwd=workdir,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stdout=stdout,
+            stderr=stderr,
         )
 
-        stdout = proc.stdout
-        if stdout is None:
-            stdout = StreamReader()
-            stdout.feed_eof()
 
-        stderr = proc.stderr
-        if stderr is None:
-            stderr = StreamReader()
-            stderr.feed_eof()
+def _simple_argv(cmd: str) -> list[str] | None:
+    """Splits the command into arguments, if it can be executed without a
+    shell."""
+    if _SHELL_SYNTAX.search(cmd):
+        return None
+    try:
+        argv = shlex.split(cmd)
+    except ValueError:
+        return None
+    if not argv or argv[0] in _SHELL_BUILTINS or "=" in argv[0]:
+        return None
+    return argv
 
-        return (proc, stdout, stderr)
 
+class _LinePrefixProtocol(asyncio.Protocol):
+    """Prints the data read from a pipe with every line prefixed.
 
-@dataclass
+    The complete lines of each read are written at once, as bytes, without
+    decoding them. Lines longer than `_MAX_LINE_SIZE` are split. When stdout
+    is interactive, output is flushed whenever the pipe has no more data ready,
+    i.e. a read is smaller than the read size. Otherwise it is left to the
+    caller to flush stdout, when the step is done.
+    """
+
+    def __init__(self, prefix: bytes) -> None:
+        self._prefix = prefix
+        self._line_sep = b"\n" + prefix
+        self._tail = bytearray()
+        self._flush_reads = interactive_stdout()
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def data_received(self, data: bytes) -> None:
+        tail = self._tail
+        end = data.rfind(b"\n")
+        if end >= 0:
+            # Only the partial lines around the read are copied to the tail,
+            # not the whole read.
+            lines = tail + memoryview(data)[:end] if tail else data[:end]
+            tail.clear()
+            tail += memoryview(data)[end + 1 :]
+            prefixed = lines.replace(b"\n", self._line_sep)
+            write_stdout(self._prefix + prefixed + b"\n")
+        else:
+            tail += data
+            if len(tail) < _MAX_LINE_SIZE:
+                return
+        if len(tail) >= _MAX_LINE_SIZE:
+            # Overlong lines are split, rather than buffered without bound.
+            write_stdout(self._prefix + tail + b"\n")
+            tail.clear()
+        if self._flush_reads and len(data) < _READ_CHUNK_SIZE:
+            sys.stdout.buffer.flush()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        if self._tail:
+            write_stdout(self._prefix + self._tail + b"\n")
+            self._tail.clear()
+
+        if self.closed.done():
+            return
+        if exc is None:
+            self.closed.set_result(None)
+        else:
+            self.closed.set_exception(exc)
+
+
+@dataclass(slots=True)
 class ShellScript(Dependency):
     """A shell script dependency.
 
@@ -60,14 +168,38 @@ class ShellScript(Dependency):
     Working directory, and environment variables are configurable, along with
     a set of target files, which will define the `last_modified` value of the
     dependency.
+
+    Without an `env`, the steps inherit the environment of this process.
+
+    The output lines of steps are prefixed with the dependency ID. Without
+    `prefix_output`, steps write directly to the output of this process. With
+    `merge_stderr`, the stderr of steps is written to their stdout.
+
+    The `env` is encoded, and the `steps` are grouped, once when the shell
+    script is created, so they should not be changed afterwards.
     """
 
-    color: str = field(default_factory=lambda: random.choice(COLORS))
-    depends_on: list["Dependency"] = field(default_factory=list)
+    color: str = field(default_factory=next_color)
+    depends_on: Sequence["Dependency"] = ()
     steps: Sequence[Step | str] = field(default_factory=list)
-    env: dict[str, str] = field(default_factory=lambda: dict(os.environ))
+    env: dict[str, str] | None = None
     workdir: str | None = None
     targets: list[str] | None = None
+    prefix_output: bool = True
+    merge_stderr: bool = False
+    _env: dict[bytes, bytes] | None = field(init=False, repr=False, compare=False)
+    _cmd_prefix: bytes = field(init=False, repr=False, compare=False)
+    _line_prefix: bytes = field(init=False, repr=False, compare=False)
+    _step_groups: list[list[Step]] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        Dependency.__post_init__(self)
+        steps = [Step(step) if isinstance(step, str) else step for step in self.steps]
+        self.steps = steps
+        self._step_groups = list(_group_steps(steps))
+        self._env = _encode_env(self.env)
+        self._cmd_prefix = f"{self.color}{self.dep_id}${TextMode.RESET}".encode()
+        self._line_prefix = f"{self.color}{self.dep_id}|{TextMode.RESET}".encode()
 
     async def _run(self) -> bool:
         exit_code = await self._run_steps()
@@ -81,42 +213,139 @@ class ShellScript(Dependency):
 
     async def _run_steps(self) -> int | None:
         workdir = self.workdir or os.curdir
-        for step in self.steps:
-            step = Step(step) if isinstance(step, str) else step
-            proc, stdout, stderr = await step.run(self.env, workdir)
-            print(self._prefix(step.cmd, "$"))
-            pstdout = self._print_stream(stdout)
-            pstderr = self._print_stream(stderr)
-            await asyncio.gather(pstdout, pstderr)
-            if exit_code := await proc.wait() != 0:
+        for group in self._step_groups:
+            if len(group) == 1:
+                exit_code = await self._run_step(group[0], workdir)
+            else:
+                exit_code = await self._run_parallel_steps(group, workdir)
+            if exit_code != 0:
                 return exit_code
 
         return None
 
-    async def _print_stream(self, stream: StreamReader) -> None:
-        while not stream.at_eof():
-            raw_ln = await stream.readline()
-            if not raw_ln:
-                continue
-            ln = raw_ln.decode().rstrip("\n")
-            print(self._prefix(ln, "|"))
-
-    def _prefix(self, s: str, sep: str) -> str:
-        return f"{self.color}{self.dep_id}{sep}{TextMode.RESET}{s}"
+    async def _run_step(self, step: Step, workdir: str) -> int:
+        if not self.prefix_output:
+            return await self._run_step_unprefixed(step, workdir)
+
+        stdout, stdout_w = _pipe()
+        stderr, stderr_w = (stdout, stdout_w) if self.merge_stderr else _pipe()
+        with stdout, stderr:
+            try:
+                proc = await step.run(
+                    self._env, workdir, stdout=stdout_w, stderr=stderr_w
+                )
+            finally:
+                os.close(stdout_w)
+                if stderr_w != stdout_w:
+                    os.close(stderr_w)
+
+            write_stdout(self._cmd_prefix + step.cmd.encode() + b"\n", flush=True)
+            pipes = (stdout,) if stderr is stdout else (stdout, stderr)
+            try:
+                printers = asyncio.gather(*(self._print_pipe(pipe) for pipe in pipes))
+                _, exit_code = await asyncio.gather(printers, proc.wait())
+            except asyncio.CancelledError:
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                raise
+            finally:
+                sys.stdout.buffer.flush()
+        return exit_code
+
+    async def _run_step_unprefixed(self, step: Step, workdir: str) -> int:
+        write_stdout(self._cmd_prefix + step.cmd.encode() + b"\n")
+        sys.stdout.buffer.flush()
+        stderr = subprocess.STDOUT if self.merge_stderr else None
+        proc = await step.run(self._env, workdir, stdout=None, stderr=stderr)
+        try:
+            return await proc.wait()
+        except asyncio.CancelledError:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+
+    async def _run_parallel_steps(self, steps: list[Step], workdir: str) -> int:
+        """Runs the steps concurrently. The first step to fail cancels the
+        remaining steps, and its exit code is returned. The remaining steps are
+        also cancelled if a step raises, or if this is cancelled."""
+        pending = {asyncio.create_task(self._run_step(step, workdir)) for step in steps}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if (exit_code := task.result()) != 0:
+                        return exit_code
+        finally:
+            for other in pending:
+                other.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        return 0
+
+    async def _print_pipe(self, pipe: BinaryIO) -> None:
+        """Prints the output read from the pipe with every line prefixed, until
+        the pipe is closed."""
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.connect_read_pipe(
+            lambda: _LinePrefixProtocol(self._line_prefix), pipe
+        )
+        try:
+            await protocol.closed
+        finally:
+            transport.close()
 
     @property
     def last_modified(self) -> datetime:
+        return datetime.fromtimestamp(self.last_modified_ts)
+
+    @property
+    def last_modified_ts(self) -> float:
         if self.targets:
-            return max(_target_last_modified(target) for target in self.targets)
+            return max(_target_last_modified_ts(target) for target in self.targets)
         else:
-            return datetime.fromtimestamp(0)
+            return 0.0
 
 
-def _target_last_modified(target: str) -> datetime:
+def _encode_env(env: dict[str, str] | None) -> dict[bytes, bytes] | None:
+    """Encodes the environment like `subprocess` does, so it is not encoded
+    again for every step."""
+    if env is None:
+        return None
+    return {os.fsencode(key): os.fsencode(value) for key, value in env.items()}
+
+
+def _target_last_modified_ts(target: str) -> float:
     try:
-        return datetime.fromtimestamp(os.stat(target).st_mtime)
+        return os.stat(target).st_mtime
     except FileNotFoundError:
-        return datetime.fromtimestamp(0)
+        return 0.0
+
+
+def _pipe() -> tuple[BinaryIO, int]:
+    """Returns the unbuffered read end of a new pipe, and the file descriptor
+    of its write end."""
+    read_fd, write_fd = os.pipe()
+    return open(read_fd, "rb", buffering=0), write_fd
+
+
+def _group_steps(steps: Sequence[Step]) -> Iterator[list[Step]]:
+    """Groups consecutive parallel steps together. Every other step is a group
+    of its own."""
+    group: list[Step] = []
+    for step in steps:
+        if not step.parallel:
+            if group:
+                yield group
+                group = []
+            yield [step]
+        else:
+            group.append(step)
+    if group:
+        yield group
 
 
 @dataclass
@@ -126,10 +355,12 @@ class ShellScriptDef(DependencyDef):
     Initializes to a `ShellScript` dependency.
     """
 
-    steps: list[str]
+    steps: list[str | Step]
     dependencies: list[DependencyDef]
     workdir: str | None = None
     targets: list[str] | None = None
+    prefix_output: bool = True
+    merge_stderr: bool = False
 
     @property
     def depends_on(self) -> list[DependencyDef]:
@@ -146,14 +377,18 @@ class ShellScriptDef(DependencyDef):
             steps=self.steps,
             workdir=self.workdir,
             targets=self.targets,
+            prefix_output=self.prefix_output,
+            merge_stderr=self.merge_stderr,
         )
 
 
 def shell(
-    *steps: str,
+    *steps: str | Step,
     depends_on: list[DependencyDef] | None = None,
     workdir: str | None = None,
     targets: list[str] | None = None,
+    prefix_output: bool = True,
+    merge_stderr: bool = False,
 ) -> ShellScriptDef:
     """Returns a shell script dependency.
 
@@ -164,5 +399,20 @@ def shell(
     >>>    workdir="go_project",
     >>>    targets=["build/bin"],
     >>> )
+
+    Example of checks, which run concurrently.
+    >>> check = shell(
+    >>>    Step("ruff check .", parallel=True),
+    >>>    Step("mypy .", parallel=True),
+    >>> )
+
+    Example of an interactive command, which writes directly to the terminal.
+    >>> serve = shell("python -m http.server", prefix_output=False)
+
+    Example of a command, whose stderr is printed along with its stdout, in
+    the order it is written.
+    >>> test = shell("pytest", merge_stderr=True)
     """
-    return ShellScriptDef(list(steps), depends_on or [], workdir, targets)
+    return ShellScriptDef(
+        list(steps), depends_on or [], workdir, targets, prefix_output, merge_stderr
+    )
@@ -1,5 +1,8 @@
 """Text output helpers."""
 
+import itertools
+import sys
+
 
 class TextMode:
     """Terminal escape codes for colorizing terminal output."""
@@ -16,7 +19,7 @@ class TextMode:
     WHITE = "\033[95m"
 
 
-COLORS = [
+COLORS = (
     TextMode.GREY,
     TextMode.RED,
     TextMode.GREEN,
@@ -25,24 +28,53 @@ COLORS = [
     TextMode.PURPLE,
     TextMode.CYAN,
     TextMode.WHITE,
-]
+)
 """All `TextMode` values, which are colors."""
 
+_color_cycle = itertools.cycle(COLORS)
+
+
+def next_color() -> str:
+    """Returns the next color of `COLORS`, cycling through them in order."""
+    return next(_color_cycle)
+
+
+_HEADER_PREFIX = f"{TextMode.BOLD}--- ".encode()
+_HEADER_SEP = f"{TextMode.RESET}{TextMode.BOLD}"
+_HEADER_SUFFIX = f"{_HEADER_SEP}{TextMode.RESET}\n".encode()
+_ERROR_PREFIX = f"{TextMode.BOLD}{TextMode.RED}--- ".encode()
+_ERROR_SEP = TextMode.RED
+_ERROR_SUFFIX = f"{_ERROR_SEP}{TextMode.RESET}\n".encode()
+
+
+def interactive_stdout() -> bool:
+    """Returns whether output should be flushed as it is written, like `print`
+    would, i.e. stdout is a terminal, line buffered, or unbuffered."""
+    stdout = sys.stdout
+    return bool(
+        stdout.isatty()
+        or stdout.line_buffering
+        or getattr(stdout, "write_through", False)
+    )
+
+
+def write_stdout(data: bytes, flush: bool = False) -> None:
+    """Writes bytes to the buffer of stdout, bypassing the text layer.
+
+    With `flush`, the output is flushed if stdout is interactive.
+    """
+    sys.stdout.buffer.write(data)
+    if flush and interactive_stdout():
+        sys.stdout.buffer.flush()
+
 
 def print_header(*args: str) -> None:
     """Prints a pretty header message."""
-    msgs = []
-    for arg in args:
-        msgs.append(arg)
-        msgs.append(TextMode.RESET)
-        msgs.append(TextMode.BOLD)
-    print(TextMode.BOLD, "--- ", *msgs, TextMode.RESET, sep="")
+    msg = _HEADER_SEP.join(args).encode()
+    write_stdout(_HEADER_PREFIX + msg + _HEADER_SUFFIX, flush=True)
 
 
 def print_error(*args: str) -> None:
     """Prints a pretty error message."""
-    msgs = []
-    for arg in args:
-        msgs.append(arg)
-        msgs.append(TextMode.RED)
-    print(TextMode.BOLD, TextMode.RED, "--- ", *msgs, TextMode.RESET, sep="")
+    msg = _ERROR_SEP.join(args).encode()
+    write_stdout(_ERROR_PREFIX + msg + _ERROR_SUFFIX, flush=True)
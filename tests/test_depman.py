@@ -1,8 +1,11 @@
+import asyncio
+from dataclasses import dataclass
 from datetime import datetime
 
 import pytest
 from goer.dep import Dependency
 from goer.depman import DependencyManager
+from goer.shell import shell
 from goer.text import TextMode
 
 DEFAULT_LAST_MODIFIED = datetime(2024, 1, 1)
@@ -30,6 +33,27 @@ class FakeDependency(Dependency):
         return self._result
 
 
+class ConcurrencyCounter:
+    def __init__(self) -> None:
+        self.running = 0
+        self.max_running = 0
+
+
+class SlowDependency(FakeDependency):
+    def __init__(self, dep_id: str, counter: ConcurrencyCounter) -> None:
+        self._counter = counter
+        super().__init__(dep_id, [])
+
+    async def _run(self) -> bool:
+        self._counter.running += 1
+        self._counter.max_running = max(
+            self._counter.max_running, self._counter.running
+        )
+        await asyncio.sleep(0.01)
+        self._counter.running -= 1
+        return await super()._run()
+
+
 @pytest.mark.asyncio()
 async def test_run_returns_result() -> None:
     dep = FakeDependency("dep-id", depends_on=[])
@@ -86,3 +110,205 @@ async def test_only_runs_dependencies_once() -> None:
     assert dep_2.call_count == 1
     assert dep_3.call_count == 1
     assert dep_4.call_count == 1
+
+
+def test_from_defs_resolves_dependencies() -> None:
+    dep_1 = shell("echo 1")
+    dep_2 = shell("echo 2", depends_on=[dep_1])
+    dep_3 = shell("echo 3", depends_on=[dep_2, dep_1])
+
+    depman = DependencyManager.from_defs(
+        {"dep-3": dep_3, "dep-2": dep_2, "dep-1": dep_1}
+    )
+
+    assert depman.deps["dep-3"].depends_on == [
+        depman.deps["dep-2"],
+        depman.deps["dep-1"],
+    ]
+    assert depman.deps["dep-2"].depends_on == [depman.deps["dep-1"]]
+    assert depman.deps["dep-1"].depends_on == []
+
+
+def test_from_defs_raises_on_cycle() -> None:
+    dep_1 = shell("echo 1")
+    dep_2 = shell("echo 2", depends_on=[dep_1])
+    dep_1.dependencies.append(dep_2)
+    dep_3 = shell("echo 3")
+
+    with pytest.raises(RuntimeError, match="cycle"):
+        DependencyManager.from_defs({"dep-1": dep_1, "dep-2": dep_2, "dep-3": dep_3})
+
+
+@pytest.mark.asyncio()
+async def test_does_not_run_dep_when_dependency_fails() -> None:
+    dep_1 = FakeDependency("dep-1", [], result=False)
+    dep_2 = FakeDependency("dep-2", [dep_1])
+    depman = DependencyManager([dep_1, dep_2])
+
+    result = await depman.run_dep(dep_2)
+
+    assert result is False
+    assert dep_1.ran_dep is True
+    assert dep_2.ran_dep is False
+
+
+@pytest.mark.asyncio()
+async def test_run_subgraph_runs_dependencies_once() -> None:
+    dep_1 = FakeDependency("dep-1", [])
+    dep_2 = FakeDependency("dep-2", [dep_1])
+    dep_3 = FakeDependency("dep-3", [dep_2, dep_1])
+    dep_4 = FakeDependency("dep-4", [dep_3, dep_2, dep_1])
+    dep_5 = FakeDependency("dep-5", [])
+    depman = DependencyManager([dep_1, dep_2, dep_3, dep_4, dep_5])
+
+    result = await depman.run_subgraph([dep_4, dep_3])
+
+    assert result is True
+    assert dep_1.call_count == 1
+    assert dep_2.call_count == 1
+    assert dep_3.call_count == 1
+    assert dep_4.call_count == 1
+    assert dep_5.ran_dep is False
+
+
+@pytest.mark.asyncio()
+async def test_run_subgraph_does_not_run_dep_when_dependency_fails() -> None:
+    dep_1 = FakeDependency("dep-1", [], result=False)
+    dep_2 = FakeDependency("dep-2", [])
+    dep_3 = FakeDependency("dep-3", [dep_1, dep_2])
+    depman = DependencyManager([dep_1, dep_2, dep_3])
+
+    result = await depman.run_subgraph([dep_3])
+
+    assert result is False
+    assert dep_1.ran_dep is True
+    assert dep_2.ran_dep is True
+    assert dep_3.ran_dep is False
+
+
+@pytest.mark.asyncio()
+async def test_reports_failed_dependencies_for_parent(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    dep_1 = FakeDependency("dep-1", [], result=False)
+    dep_2 = FakeDependency("dep-2", [])
+    dep_3 = FakeDependency("dep-3", [dep_1, dep_2])
+    depman = DependencyManager([dep_1, dep_2, dep_3])
+
+    result = await depman.run_dep(dep_3)
+
+    assert result is False
+    out = capsys.readouterr().out
+    assert f"dependency failed for '{TextMode.RED}{dep_3.pretty_id}" in out
+
+
+@pytest.mark.asyncio()
+async def test_only_starts_shared_dependency_tree_once(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    dep_1 = FakeDependency("dep-1", [])
+    dep_2 = FakeDependency("dep-2", [dep_1])
+    dep_3 = FakeDependency("dep-3", [dep_2])
+    dep_4 = FakeDependency("dep-4", [dep_2])
+    dep_5 = FakeDependency("dep-5", [dep_3, dep_4])
+    depman = DependencyManager([dep_1, dep_2, dep_3, dep_4, dep_5])
+
+    result = await depman.run_dep(dep_5)
+
+    out = capsys.readouterr().out
+    assert result is True
+    assert dep_2.call_count == 1
+    assert out.count(f"starting '{TextMode.RESET}{TextMode.BOLD}{dep_2.pretty_id}") == 1
+
+
+def test_from_defs_raises_on_unknown_dependency() -> None:
+    dep_1 = shell("echo 1", depends_on=[shell("echo inline")])
+
+    with pytest.raises(RuntimeError, match="dependency of 'dep-1'"):
+        DependencyManager.from_defs({"dep-1": dep_1})
+
+
+@pytest.mark.asyncio()
+async def test_run_subgraph_bounds_concurrent_dependencies() -> None:
+    counter = ConcurrencyCounter()
+    deps = [SlowDependency(f"dep-{i}", counter) for i in range(4)]
+    depman = DependencyManager(deps, max_concurrency=2)
+
+    result = await depman.run_subgraph(deps)
+
+    assert result is True
+    assert all(dep.call_count == 1 for dep in deps)
+    assert counter.max_running == 2
+
+
+@pytest.mark.asyncio()
+async def test_run_subgraph_skips_up_to_date_subtree_unless_forced() -> None:
+    dep_1 = FakeDependency("dep-1", [])
+    dep_2 = FakeDependency("dep-2", [dep_1])
+    dep_2._last_modified = datetime(2024, 1, 2)
+    depman = DependencyManager([dep_1, dep_2])
+
+    assert await depman.run_subgraph([dep_2]) is True
+    assert dep_1.ran_dep is False
+    assert dep_2.ran_dep is False
+
+    assert await depman.run_subgraph([dep_2], force=True) is True
+    assert dep_1.ran_dep is True
+    assert dep_2.ran_dep is True
+
+
+class BrokenDependency(FakeDependency):
+    @property
+    def last_modified(self) -> datetime:
+        raise ValueError("broken")
+
+
+@pytest.mark.asyncio()
+async def test_concurrent_run_dep_calls_share_errors() -> None:
+    dep_1 = BrokenDependency("dep-1", [])
+    dep_2 = FakeDependency("dep-2", [dep_1])
+    depman = DependencyManager([dep_1, dep_2])
+
+    results = await asyncio.gather(
+        depman.run_dep(dep_2), depman.run_dep(dep_2), return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+@dataclass
+class PlainDependency(Dependency):
+    async def _run(self) -> bool:
+        return True
+
+
+@pytest.mark.asyncio()
+async def test_run_subgraph_runs_dataclass_subclass_without_slots() -> None:
+    dep = PlainDependency("dep")
+    depman = DependencyManager([dep])
+
+    result = await depman.run_subgraph([dep])
+
+    assert result is True
+    assert dep.task is not None
+
+
+class PrintingDependency(FakeDependency):
+    async def _run(self) -> bool:
+        await asyncio.sleep(0.01)
+        print(f"ran {self.dep_id}")
+        return await super()._run()
+
+
+@pytest.mark.asyncio()
+async def test_reports_start_once_dependency_gets_a_slot(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    deps = [PrintingDependency(f"dep-{i}", []) for i in range(3)]
+    depman = DependencyManager(deps, max_concurrency=1)
+
+    result = await depman.run_subgraph(deps)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert result is True
+    assert [line.startswith("ran ") for line in lines] == [False, True] * 3
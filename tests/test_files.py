@@ -0,0 +1,73 @@
+import os
+from datetime import datetime
+from pathlib import Path
+
+from goer.files import Glob
+
+
+def _touch(path: Path, mtime: float) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    os.utime(path, (mtime, mtime))
+
+
+def test_glob_last_modified_is_latest_match(tmp_path: Path) -> None:
+    _touch(tmp_path / "a.txt", 1000)
+    _touch(tmp_path / "b.txt", 3000)
+    _touch(tmp_path / "c.log", 5000)
+    _touch(tmp_path / ".hidden.txt", 7000)
+
+    glob = Glob("glob", str(tmp_path / "*.txt"))
+
+    assert glob.last_modified == datetime.fromtimestamp(3000)
+
+
+def test_glob_last_modified_with_wildcard_directory(tmp_path: Path) -> None:
+    _touch(tmp_path / "a" / "file.txt", 1000)
+    _touch(tmp_path / "b" / "file.txt", 2000)
+
+    glob = Glob("glob", str(tmp_path / "*" / "file.txt"))
+
+    assert glob.last_modified == datetime.fromtimestamp(2000)
+
+
+def test_glob_last_modified_of_single_file(tmp_path: Path) -> None:
+    _touch(tmp_path / "a.txt", 1000)
+
+    glob = Glob("glob", str(tmp_path / "a.txt"))
+
+    assert glob.last_modified == datetime.fromtimestamp(1000)
+
+
+def test_glob_last_modified_is_cached_until_invalidated(tmp_path: Path) -> None:
+    _touch(tmp_path / "a.txt", 1000)
+    glob = Glob("glob", str(tmp_path / "*.txt"))
+    assert glob.last_modified_ts == 1000
+
+    _touch(tmp_path / "b.txt", 2000)
+    assert glob.last_modified_ts == 1000
+
+    glob.invalidate()
+    assert glob.last_modified_ts == 2000
+
+
+def test_glob_last_modified_with_recursive_directory(tmp_path: Path) -> None:
+    _touch(tmp_path / "a.txt", 1000)
+    _touch(tmp_path / "a" / "b" / "c.txt", 3000)
+    _touch(tmp_path / "a" / "b" / "d.log", 5000)
+    _touch(tmp_path / ".hidden" / "e.txt", 7000)
+
+    glob = Glob("glob", str(tmp_path / "**" / "*.txt"))
+
+    assert glob.last_modified == datetime.fromtimestamp(3000)
+
+
+def test_glob_recursive_directory_follows_symlinks(tmp_path: Path) -> None:
+    _touch(tmp_path / "src" / "a.txt", 1000)
+    _touch(tmp_path / "shared" / "b.txt", 3000)
+    (tmp_path / "src" / "shared").symlink_to(tmp_path / "shared")
+    (tmp_path / "src" / "loop").symlink_to(tmp_path / "src")
+
+    glob = Glob("glob", str(tmp_path / "src" / "**" / "*.txt"))
+
+    assert glob.last_modified == datetime.fromtimestamp(3000)
@@ -0,0 +1,39 @@
+import pytest
+from goer.main import parse_args
+
+
+def test_parse_args_dependencies_and_flags() -> None:
+    args = parse_args(["-f", "dep-1", "--jobs", "2", "dep-2"])
+
+    assert args.dep_ids == ["dep-1", "dep-2"]
+    assert args.force is True
+    assert args.max_concurrency == 2
+
+
+def test_parse_args_defaults() -> None:
+    args = parse_args(["dep-1"])
+
+    assert args.force is False
+    assert args.max_concurrency is None
+
+
+@pytest.mark.parametrize("jobs", [["-j", "3"], ["-j3"], ["--jobs", "3"], ["--jobs=3"]])
+def test_parse_args_jobs_forms(jobs: list[str]) -> None:
+    assert parse_args(jobs).max_concurrency == 3
+
+
+@pytest.mark.parametrize(
+    ("args", "error"),
+    [
+        (["-j"], "-j requires a number"),
+        (["--jobs"], "--jobs requires a number"),
+        (["-j", "0"], "-j must be a positive number"),
+        (["--jobs=x"], "--jobs must be a positive number"),
+        (["-jx"], "-j must be a positive number"),
+        (["-x"], "unknown option -x"),
+        (["--force=1"], "unknown option --force=1"),
+    ],
+)
+def test_parse_args_rejects_invalid_arguments(args: list[str], error: str) -> None:
+    with pytest.raises(ValueError, match=error):
+        parse_args(args)
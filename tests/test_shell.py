@@ -1,5 +1,10 @@
+import asyncio
+from asyncio import subprocess
+from pathlib import Path
+
 import pytest
-from goer.shell import ShellScript
+from goer.shell import ShellScript, Step
+from goer.text import TextMode
 
 
 @pytest.mark.asyncio
@@ -9,3 +14,241 @@ async def test_shellscript() -> None:
     result = await sh.run()
 
     assert result is True
+
+
+@pytest.mark.asyncio
+async def test_shellscript_prefixes_output(capsys: pytest.CaptureFixture[str]) -> None:
+    sh = ShellScript("my_job", color=TextMode.BLUE, steps=["printf 'a\\nb\\nc'"])
+
+    result = await sh.run()
+
+    prefix = f"{TextMode.BLUE}my_job|{TextMode.RESET}"
+    assert result is True
+    assert capsys.readouterr().out.splitlines()[1:] == [
+        f"{prefix}a",
+        f"{prefix}b",
+        f"{prefix}c",
+    ]
+
+
+def test_step_executes_simple_commands_without_bash() -> None:
+    assert Step("gcc -c 'my file.c' -DX=1")._argv == ["gcc", "-c", "my file.c", "-DX=1"]
+    assert Step("cat *.txt > out.txt")._argv is None
+    assert Step("cd build")._argv is None
+    assert Step("CC=clang make")._argv is None
+
+
+@pytest.mark.asyncio
+async def test_shellscript_fails_on_missing_program() -> None:
+    sh = ShellScript("my_job", steps=["goer-test-no-such-program"])
+
+    result = await sh.run()
+
+    assert result is False
+
+
+@pytest.mark.asyncio
+async def test_shellscript_prints_output_across_chunks(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    sh = ShellScript("my_job", color=TextMode.BLUE, steps=["seq 100000"])
+
+    result = await sh.run()
+
+    prefix = f"{TextMode.BLUE}my_job|{TextMode.RESET}"
+    assert result is True
+    assert capsys.readouterr().out.splitlines()[1:] == [
+        f"{prefix}{i}" for i in range(1, 100001)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_shellscript_reports_exit_code(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    sh = ShellScript("my_job", steps=["exit 3", "echo not reached"])
+
+    result = await sh.run()
+
+    out = capsys.readouterr().out
+    assert result is False
+    assert "exit code 3" in out
+    assert "not reached" not in out
+
+
+@pytest.mark.asyncio
+async def test_shellscript_runs_parallel_steps_concurrently(tmp_path: Path) -> None:
+    sh = ShellScript(
+        "my_job",
+        steps=[
+            Step(f"sleep 0.2; touch {tmp_path}/a", parallel=True),
+            Step(f"test ! -e {tmp_path}/a && touch {tmp_path}/b", parallel=True),
+            f"test -e {tmp_path}/a && test -e {tmp_path}/b",
+        ],
+    )
+
+    result = await sh.run()
+
+    assert result is True
+
+
+@pytest.mark.asyncio
+async def test_shellscript_cancels_parallel_steps_on_failure(tmp_path: Path) -> None:
+    sh = ShellScript(
+        "my_job",
+        steps=[
+            Step(f"sleep 0.5; touch {tmp_path}/a", parallel=True),
+            Step("exit 1", parallel=True),
+        ],
+    )
+
+    result = await sh.run()
+
+    assert result is False
+    assert not (tmp_path / "a").exists()
+
+
+class RaisingStep(Step):
+    async def run(
+        self,
+        env: dict[str, str] | dict[bytes, bytes] | None = None,
+        workdir: str | None = None,
+        *,
+        stdout: int | None,
+        stderr: int | None,
+    ) -> subprocess.Process:
+        raise OSError("cannot start step")
+
+
+@pytest.mark.asyncio
+async def test_shellscript_cancels_parallel_steps_on_error(tmp_path: Path) -> None:
+    sh = ShellScript(
+        "my_job",
+        steps=[
+            Step(f"sleep 0.5; touch {tmp_path}/a", parallel=True),
+            RaisingStep("raise", parallel=True),
+        ],
+    )
+
+    result = await sh.run()
+    await asyncio.sleep(0.7)
+
+    assert result is False
+    assert not (tmp_path / "a").exists()
+
+
+@pytest.mark.asyncio
+async def test_shellscript_cancels_parallel_steps_when_cancelled(
+    tmp_path: Path,
+) -> None:
+    sh = ShellScript(
+        "my_job",
+        steps=[
+            Step(f"sleep 0.5; touch {tmp_path}/a", parallel=True),
+            Step(f"sleep 0.5; touch {tmp_path}/b", parallel=True),
+        ],
+    )
+
+    task = asyncio.create_task(sh.run())
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    await asyncio.sleep(0.7)
+
+    assert not (tmp_path / "a").exists()
+    assert not (tmp_path / "b").exists()
+
+
+@pytest.mark.asyncio
+async def test_shellscript_without_prefix_writes_output_directly(
+    capfd: pytest.CaptureFixture[str],
+) -> None:
+    sh = ShellScript(
+        "my_job", color=TextMode.BLUE, steps=["echo hello"], prefix_output=False
+    )
+
+    result = await sh.run()
+
+    assert result is True
+    assert capfd.readouterr().out.splitlines()[1:] == ["hello"]
+
+
+@pytest.mark.asyncio
+async def test_shellscript_runs_steps_with_env(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    sh = ShellScript(
+        "my_job",
+        color=TextMode.BLUE,
+        steps=["echo $GOER_TEST", "printenv GOER_TEST"],
+        env={"GOER_TEST": "hello"},
+    )
+
+    result = await sh.run()
+
+    prefix = f"{TextMode.BLUE}my_job|{TextMode.RESET}"
+    assert result is True
+    assert capsys.readouterr().out.splitlines()[1::2] == [
+        f"{prefix}hello",
+        f"{prefix}hello",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_shellscript_splits_overlong_lines(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    sh = ShellScript(
+        "my_job", color=TextMode.BLUE, steps=["head -c 3000000 /dev/zero | tr '\\0' a"]
+    )
+
+    result = await sh.run()
+
+    prefix = f"{TextMode.BLUE}my_job|{TextMode.RESET}"
+    lines = capsys.readouterr().out.splitlines()[1:]
+    assert result is True
+    assert len(lines) > 1
+    assert all(line.startswith(prefix) for line in lines)
+    assert sum(len(line) - len(prefix) for line in lines) == 3000000
+
+
+@pytest.mark.asyncio
+async def test_shellscript_merges_stderr(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    sh = ShellScript(
+        "my_job",
+        color=TextMode.BLUE,
+        steps=["echo out; echo err >&2; echo out"],
+        merge_stderr=True,
+    )
+
+    result = await sh.run()
+
+    prefix = f"{TextMode.BLUE}my_job|{TextMode.RESET}"
+    assert result is True
+    assert capsys.readouterr().out.splitlines()[1:] == [
+        f"{prefix}out",
+        f"{prefix}err",
+        f"{prefix}out",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_shellscript_without_prefix_merges_stderr(
+    capfd: pytest.CaptureFixture[str],
+) -> None:
+    sh = ShellScript(
+        "my_job",
+        steps=["echo err >&2"],
+        prefix_output=False,
+        merge_stderr=True,
+    )
+
+    result = await sh.run()
+
+    out, err = capfd.readouterr()
+    assert result is True
+    assert out.splitlines()[1:] == ["err"]
+    assert err == ""
@@ -0,0 +1,33 @@
+import io
+import sys
+
+import pytest
+from goer.text import TextMode, interactive_stdout, print_error, print_header
+
+
+def test_print_header(capsys: pytest.CaptureFixture[str]) -> None:
+    print_header("starting '", "dep", "'")
+
+    R, B = TextMode.RESET, TextMode.BOLD
+    assert capsys.readouterr().out == f"{B}--- starting '{R}{B}dep{R}{B}'{R}{B}{R}\n"
+
+
+def test_print_error(capsys: pytest.CaptureFixture[str]) -> None:
+    print_error("failed '", "dep", "'")
+
+    R, B, RED = TextMode.RESET, TextMode.BOLD, TextMode.RED
+    assert capsys.readouterr().out == f"{B}{RED}--- failed '{RED}dep{RED}'{RED}{R}\n"
+
+
+def test_interactive_stdout(monkeypatch: pytest.MonkeyPatch) -> None:
+    buffered = io.TextIOWrapper(io.BytesIO())
+    monkeypatch.setattr(sys, "stdout", buffered)
+    assert interactive_stdout() is False
+
+    line_buffered = io.TextIOWrapper(io.BytesIO(), line_buffering=True)
+    monkeypatch.setattr(sys, "stdout", line_buffered)
+    assert interactive_stdout() is True
+
+    unbuffered = io.TextIOWrapper(io.BytesIO(), write_through=True)
+    monkeypatch.setattr(sys, "stdout", unbuffered)
+    assert interactive_stdout() is True